@@ -0,0 +1,37 @@
+import os
+from dataclasses import dataclass
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- CONFIGURATION ---
+# All settings are loaded once from the environment file and shared by the scripts.
+# The URL of the DocuWare file cabinet documents is built here once instead of for every request.
+@dataclass(frozen=True, slots=True)
+class Config:
+    dw_url: str
+    dw_user: str
+    dw_pw: str
+    dw_org: str
+    dw_guid: str
+    access: str
+    sqlite_database: str
+    sqlite_table: str
+    docs_url: str
+
+def load_config() -> Config:
+    dw_url  = os.getenv("DW_URL")
+    dw_guid = os.getenv("DW_GUID")
+    return Config(
+        dw_url=dw_url,
+        dw_user=os.getenv("DW_USER"),
+        dw_pw=os.getenv("DW_PW"),
+        dw_org=os.getenv("DW_ORG"),
+        dw_guid=dw_guid,
+        access=os.getenv("ACCESS"),
+        sqlite_database=os.getenv("SQLITE_DATABASE"),
+        sqlite_table=os.getenv("SQLITE_TABLE"),
+        docs_url=f"{dw_url}/FileCabinets/{dw_guid}/Documents"
+    )
+
+CFG = load_config()
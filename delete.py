@@ -1,39 +1,59 @@
-import os
 import sqlite3
+import time
 import logging
-import requests
-from dotenv import load_dotenv
+import httpx
+import ijson
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+from concurrent.futures import ThreadPoolExecutor
+from config import CFG
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-load_dotenv()
-
 # --- CONSTANTS ---
-# All constants are loaded from the environment file.
-DW_URL  = os.getenv("DW_URL")
-DW_USER = os.getenv("DW_USER")
-DW_PW   = os.getenv("DW_PW")
-DW_ORG  = os.getenv("DW_ORG")
-DW_GUID = os.getenv("DW_GUID")
-SQLITE_DATABASE = os.getenv("SQLITE_DATABASE")
-SQLITE_TABLE    = os.getenv("SQLITE_TABLE")
+# The environment settings are loaded once in config.py.
+
+# Number of DELETE requests sent to DocuWare in parallel.
+DELETE_WORKERS = 32
+
+# How often the same batch may be returned again before giving up, and the base delay between those attempts.
+SAME_BATCH_RETRIES = 3
+SAME_BATCH_DELAY   = 2
 
 # --- DOCUWARE SESSION ---
 # Login requires not only a username and password, but also the organization name and license type.
 # A status code other than 200 indicates a failed login attempt.
 # Logout is performed using the session and the logout URL.
-def login() -> requests.Session:
-    session = requests.Session()
-    response = session.post(
-        f"{DW_URL}/Account/Logon",
-        data={
-            "UserName": DW_USER,
-            "Password": DW_PW,
-            "Organization": DW_ORG,
-            "LicenseType": "NamedUser"
-        },
-        headers={"Content-Type": "application/x-www-form-urlencoded"}
+# The session is an HTTP/2 client, so the login and all later requests share one multiplexed connection.
+# Like a requests session, it follows redirects and has no timeout, since large listings and batch deletions can be slow.
+# Failed connection attempts are retried by the transport, and the whole login is retried with
+# exponential backoff if the server cannot be reached.
+@retry(
+    retry=retry_if_exception_type(httpx.TransportError),
+    wait=wait_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True
+)
+def login() -> httpx.Client:
+    limits = httpx.Limits(max_connections=DELETE_WORKERS, max_keepalive_connections=DELETE_WORKERS)
+    session = httpx.Client(
+        transport=httpx.HTTPTransport(http2=True, limits=limits, retries=3),
+        timeout=None,
+        follow_redirects=True
     )
+    try:
+        response = session.post(
+            f"{CFG.dw_url}/Account/Logon",
+            data={
+                "UserName": CFG.dw_user,
+                "Password": CFG.dw_pw,
+                "Organization": CFG.dw_org,
+                "LicenseType": "NamedUser"
+            },
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+    except Exception:
+        session.close()
+        raise
     if response.status_code != 200:
         logging.error("Login failed: %s", response.text)
     else:
@@ -41,56 +61,130 @@ def login() -> requests.Session:
     return session
 
 # --- DELETE DOCUWARE DATA ---
+# Streams the IDs of the listed data entries from the response body.
+# The items are parsed one at a time instead of loading the whole JSON document into memory.
+def iter_docuware_ids(response: httpx.Response):
+    items = ijson.sendable_list()
+    parser = ijson.items_coro(items, "Items.item")
+    for chunk in response.iter_bytes():
+        parser.send(chunk)
+        for item in items:
+            yield item.get("Id") or item.get("DocID")
+        del items[:]
+    parser.close()
+    for item in items:
+        yield item.get("Id") or item.get("DocID")
+
+# Deletes a single data entry and logs the result. Successful deletions are only logged at debug level.
+def delete_docuware_entry(session: httpx.Client, data_id) -> bool:
+    del_url = f"{CFG.docs_url}/{data_id}"
+    del_response = session.delete(del_url)
+    if del_response.status_code == 200:
+        logging.debug("Deleted DocuWare data entry ID: %s", data_id)
+        return True
+    logging.error("Failed to delete DocuWare data entry %s: %s", data_id, del_response.text)
+    return False
+
+# Deletes a whole batch of data entries with a single request.
+# Returns False if the server rejects the batch request, so the caller can fall back to single deletions.
+def delete_docuware_batch(session: httpx.Client, data_ids: list) -> bool:
+    response = session.post(
+        f"{CFG.docs_url}/Batch",
+        json={"Ids": data_ids},
+        headers={"Accept": "application/json", "Content-Type": "application/json"}
+    )
+    if response.status_code != 200:
+        logging.warning("Batch deletion rejected (%s), falling back to single deletions.", response.status_code)
+        return False
+    logging.info("Deleted %d DocuWare data entries in one batch.", len(data_ids))
+    return True
+
 # Deletes all data entries (not documents) from the specified DocuWare file cabinet.
 # The request is repeated in batches of 10,000 until no more entries are found.
-def delete_docuware_data(session: requests.Session) -> None:
+# Each batch is deleted with a single batch request. If the server does not support it,
+# the deletions are sent in parallel over the pooled keep-alive connections of the session.
+# The ID range of each batch is remembered. If the server returns the same range again, the deletions
+# are not visible yet, so the script waits instead of deleting the same entries twice.
+# Returns True only if the file cabinet was emptied.
+def delete_docuware_data(session: httpx.Client) -> bool:
 
-    while True:
-        url = f"{DW_URL}/FileCabinets/{DW_GUID}/Documents?count=10000&query=DWDocID:*"
-        response = session.get(url, headers={"Accept": "application/json"})
+    use_batch = True
+    last_range = None
+    repeats = 0
+    url = f"{CFG.docs_url}?count=10000&query=DWDocID:*"
+    with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+        while True:
+            with session.stream("GET", url, headers={"Accept": "application/json"}) as response:
+                if response.status_code != 200:
+                    response.read()
+                    logging.error("Failed to load data: %s", response.status_code)
+                    logging.error(response.text)
+                    return False
 
-        if response.status_code != 200:
-            logging.error("Failed to load data: %s", response.status_code)
-            logging.error(response.text)
-            break
+                data_ids = list(iter_docuware_ids(response))
+            data_count = len(data_ids)
+            logging.info("Found %d DocuWare data entries to delete.", data_count)
 
-        items = response.json().get("Items", [])
-        data_count = len(items)
-        logging.info("Found %d DocuWare data entries to delete.", data_count)
+            if data_count == 0:
+                logging.info("No more DocuWare data found. Exiting deletion loop.")
+                return True
 
-        if data_count == 0:
-            logging.info("No more DocuWare data found. Exiting deletion loop.")
-            break
+            if None in data_ids:
+                data_ids = [data_id for data_id in data_ids if data_id is not None]
+                logging.warning("Skipped %d DocuWare data entries without an ID.", data_count - len(data_ids))
+                if not data_ids:
+                    logging.error("No DocuWare data entry with an ID found. Exiting deletion loop.")
+                    return False
 
-        for item in items:
-            data_id = item.get("Id") or item.get("DocID")
-            del_url = f"{DW_URL}/FileCabinets/{DW_GUID}/Documents/{data_id}"
-            del_response = session.delete(del_url)
-            if del_response.status_code == 200:
-                logging.info("Deleted DocuWare data entry ID: %s", data_id)
-            else:
-                logging.error("Failed to delete DocuWare data entry %s: %s", data_id, del_response.text)
+            data_range = (min(data_ids), max(data_ids))
+            if data_range == last_range:
+                repeats += 1
+                if repeats <= SAME_BATCH_RETRIES:
+                    logging.warning("DocuWare returned the same entries again, retrying in %d seconds.", SAME_BATCH_DELAY * repeats)
+                    time.sleep(SAME_BATCH_DELAY * repeats)
+                    continue
+                if not use_batch:
+                    logging.error("DocuWare keeps returning the entries %s to %s. Exiting deletion loop.", *data_range)
+                    return False
+                logging.warning("Batch deletion had no effect, falling back to single deletions.")
+                use_batch = False
+            repeats = 0
+            last_range = data_range
+
+            if use_batch:
+                use_batch = delete_docuware_batch(session, data_ids)
+                if use_batch:
+                    continue
+            deleted = sum(executor.map(lambda data_id: delete_docuware_entry(session, data_id), data_ids))
+            logging.info("Deleted %d of %d DocuWare data entries.", deleted, len(data_ids))
 
 # --- CLEAR SQLITE TABLE ---
 # Clears the local SQLite table 'cache_table' that tracks processed entries.
+# Uses the same WAL journal as the import script, and skips the fsync since the table is emptied anyway.
 def clear_sqlite_table() -> None:
     try:
-        with sqlite3.connect(SQLITE_DATABASE) as conn:
-            cursor = conn.cursor()
-            cursor.execute(f"DELETE FROM {SQLITE_TABLE}")
-            conn.commit()
-        logging.info(f"Local table '{SQLITE_TABLE}' cleared.")
+        with sqlite3.connect(CFG.sqlite_database) as conn:
+            conn.executescript(f"""
+                PRAGMA journal_mode=WAL;
+                PRAGMA synchronous=OFF;
+                DELETE FROM {CFG.sqlite_table};
+            """)
+        logging.info(f"Local table '{CFG.sqlite_table}' cleared.")
     except Exception as e:
         logging.error("SQLite cleanup failed: %s", e)
 
 # --- MAIN ENTRY POINT ---
 # Logs into DocuWare, deletes data entries from DocuWare, and clears the local SQLite database cache.
+# The cache is only cleared if all DocuWare data entries were deleted, so it stays in sync with the file cabinet.
 def main() -> None:
 
     try:
-        session = login()
-        delete_docuware_data(session)
-        clear_sqlite_table()
+        with login() as session:
+            emptied = delete_docuware_data(session)
+        if emptied:
+            clear_sqlite_table()
+        else:
+            logging.error("DocuWare data was not deleted completely. Local table '%s' is kept.", CFG.sqlite_table)
 
     except Exception as e:
         logging.error("Script failed: %s", e)
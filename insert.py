@@ -1,183 +1,350 @@
 # --- IMPORTS ---
-import os
 import sqlite3
 import requests
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 import pandas as pd
 import pyodbc
 import logging
 import math
-from dotenv import load_dotenv
+import hashlib
+import atexit
+import functools
+from config import CFG
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-load_dotenv()
-
 # --- CONSTANTS ---
-# All constants are loaded from the environment file.
-DW_URL  = os.getenv("DW_URL")
-DW_USER = os.getenv("DW_USER")
-DW_PW   = os.getenv("DW_PW")
-DW_ORG  = os.getenv("DW_ORG")
-DW_GUID = os.getenv("DW_GUID")
-ACCESS  = os.getenv("ACCESS")
-SQLITE_DATABASE = os.getenv("SQLITE_DATABASE")
-SQLITE_TABLE    = os.getenv("SQLITE_TABLE")
+# The environment settings are loaded once in config.py.
+
+# Up to this many tracked entries are kept in memory for duplicate checks.
+# Larger tables use a Bloom filter in front of SQLite instead.
+SEEN_SET_LIMIT = 1_000_000
+
+# Number of entries sent to DocuWare in parallel, and number of entries uploaded per batch.
+UPLOAD_WORKERS = 32
+UPLOAD_BATCH_SIZE = 64
+
+# Headers for the JSON requests sent to DocuWare.
+JSON_HEADERS = {"Accept": "application/json", "Content-Type": "application/json"}
 
 # --- DATABASE SETUP ---
 # Connect to MS Access using ODBC
+# The connection is opened once and reused for all queries; it is closed when the script exits.
+@functools.lru_cache(maxsize=1)
+def access_connection():
+    conn_str = (
+        r'DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};'
+        f'DBQ={CFG.access};'
+    )
+    conn = pyodbc.connect(conn_str)
+    atexit.register(conn.close)
+    return conn
+
 def connect_access():
     try:
-        conn_str = (
-            r'DRIVER={Microsoft Access Driver (*.mdb, *.accdb)};'
-            f'DBQ={ACCESS};'
-        )
-        return pyodbc.connect(conn_str)
+        return access_connection()
     except Exception as e:
         logging.error("Failed to connect to Access: %s", e)
         return None
 
+# Probabilistic set of (field1, field2) pairs with a false positive rate of about fp_rate.
+# The hash positions are derived from two hashlib digests using double hashing.
+class BloomFilter:
+    def __init__(self, expected, fp_rate=0.01):
+        expected = max(expected, 1)
+        self.size = math.ceil(-expected * math.log(fp_rate) / (math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / expected * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        data = "\x00".join("" if value is None else str(value) for value in key).encode()
+        h1 = int.from_bytes(hashlib.md5(data).digest()[:8], "little")
+        h2 = int.from_bytes(hashlib.sha1(data).digest()[:8], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, key):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+# Builds the key used for duplicate checks and stored in the tracking table. The table has TEXT columns,
+# so values are compared as strings; this way numeric Access values match the entries of earlier runs.
+def tracking_key(field1, field2):
+    return ("" if field1 is None else str(field1), "" if field2 is None else str(field2))
+
 # Connect to SQLite and create the table if it does not exist
+# A single connection is kept open for the whole run. New entries are collected and written
+# in batches of batch_size rows, each within one transaction.
+# The statements used per row are built once, so the connection's statement cache can reuse them.
 class SQLiteManager:
-    def __init__(self):
-        self.db_path = SQLITE_DATABASE
-        self.table_name = SQLITE_TABLE
+    def __init__(self, batch_size=1000):
+        self.db_path = CFG.sqlite_database
+        self.table_name = CFG.sqlite_table
+        self.seen = set()
+        self.bloom = None
+        self.pending = []
+        self.pending_keys = set()
+        self.batch_size = batch_size
+        self.insert_query = f"""INSERT OR REPLACE INTO {self.table_name} (id, field1, field2) VALUES (?, ?, ?)"""
+        self.duplicate_query = f"""SELECT 1 FROM {self.table_name} WHERE field1 = ? AND field2 = ?"""
+        self.conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=256)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
 
     def execute(self, query, params=None, fetch=False):
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.cursor()
-            cur.execute(query, params or ())
-            if fetch:
-                return cur.fetchall()
+        cur = self.conn.execute(query, params or ())
+        if fetch:
+            return cur.fetchall()
 
+    # Creates the table and loads all tracked entries once, so duplicate checks do not query SQLite per row.
+    # Large tables are loaded into a Bloom filter instead, which only falls back to SQLite for possible duplicates.
+    # Those lookups use an index on (field1, field2); entries that are not written yet are checked in memory.
     def setup(self):
         self.execute(f"""CREATE TABLE IF NOT EXISTS {self.table_name} (id TEXT PRIMARY KEY, field1 TEXT, field2 TEXT)""")
+        self.execute(f"""CREATE INDEX IF NOT EXISTS {self.table_name}_fields ON {self.table_name} (field1, field2)""")
+        count = self.execute(f"""SELECT COUNT(*) FROM {self.table_name}""", fetch=True)[0][0]
+        rows = self.conn.execute(f"""SELECT field1, field2 FROM {self.table_name}""")
+        if count <= SEEN_SET_LIMIT:
+            self.seen = {tracking_key(field1, field2) for field1, field2 in rows}
+        else:
+            self.bloom = BloomFilter(expected=count * 2)
+            for field1, field2 in rows:
+                self.bloom.add(tracking_key(field1, field2))
         logging.info(f"SQLite table '{self.table_name}' initialized.")
 
     def is_duplicate(self, field1, field2):
-        query = f"""SELECT 1 FROM {self.table_name} WHERE field1 = ? AND field2 = ?"""
-        result = self.execute(query, (field1 or "", field2 or ""), fetch=True)
-        return bool(result)
+        key = tracking_key(field1, field2)
+        if self.bloom is None:
+            return key in self.seen
+        if key not in self.bloom:
+            return False
+        if key in self.pending_keys:
+            return True
+        return bool(self.execute(self.duplicate_query, key, fetch=True))
 
     def insert(self, id_val, **fields):
-        with sqlite3.connect(self.db_path) as conn:
-            cur = conn.cursor()
-            cur.execute(
-                f"""INSERT OR REPLACE INTO {self.table_name} (id, field1, field2) VALUES (?, ?, ?)""",
-                (id_val, fields.get("field1"), fields.get("field2"))
-            )
-            conn.commit()
-        logging.info("Eintrag gespeichert: %s", id_val)
+        key = tracking_key(fields.get("field1"), fields.get("field2"))
+        self.pending.append((id_val, *key))
+        self.pending_keys.add(key)
+        if self.bloom is None:
+            self.seen.add(key)
+        else:
+            self.bloom.add(key)
+        logging.debug("Eintrag vorgemerkt: %s", id_val)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    # Writes all pending entries within a single transaction.
+    def flush(self):
+        if not self.pending:
+            return
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(self.insert_query, self.pending)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        logging.info("%d Einträge gespeichert.", len(self.pending))
+        self.pending.clear()
+        self.pending_keys.clear()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
 
 # --- DOCUWARE SESSION ---
 # Login requires not only a username and password, but also the organization name and license type.
 # A status code other than 200 indicates a failed login attempt.
 # Logout is performed using the session and the logout URL.
+# A login that fails because the server cannot be reached is retried up to five times with exponential
+# backoff; a rejected login is not retried. Requests of the session are retried only if the
+# connection to the server cannot be established.
+@retry(
+    retry=retry_if_exception_type((requests.ConnectionError, requests.Timeout)),
+    wait=wait_exponential(multiplier=1, max=30),
+    stop=stop_after_attempt(5),
+    reraise=True
+)
 def docuware_login():
     session = requests.Session()
-    response = session.post(
-        f"{DW_URL}/Account/Logon",data={"UserName": DW_USER, "Password": DW_PW, "Organization": DW_ORG,"LicenseType": "NamedUser"},
-        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    adapter = HTTPAdapter(
+        pool_connections=UPLOAD_WORKERS,
+        pool_maxsize=UPLOAD_WORKERS,
+        max_retries=Retry(total=5, backoff_factor=0.5)
     )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    try:
+        response = session.post(
+            f"{CFG.dw_url}/Account/Logon",data={"UserName": CFG.dw_user, "Password": CFG.dw_pw, "Organization": CFG.dw_org,"LicenseType": "NamedUser"},
+            headers={"Content-Type": "application/x-www-form-urlencoded"}
+        )
+    except Exception:
+        session.close()
+        raise
     if response.status_code != 200:
         logging.error("DocuWare login failed: %s", response.text)
+        session.close()
         raise Exception("DocuWare login failed.")
     logging.info("DocuWare login successful.")
     return session
 
 def docuware_logout(session):
     try:
-        session.post(f"{DW_URL}/Account/Logoff")
+        session.post(f"{CFG.dw_url}/Account/Logoff")
         logging.info("DocuWare logout successful.")
     except Exception as e:
         logging.error("DocuWare logout error: %s", e)
 
 # --- UTILITY FUNCTIONS ---
 # Executes the given SQL query using an MS Access connection.
-# Returns a pandas DataFrame with the results, or an empty DataFrame on failure.
-def fetch_data(query):
+# Yields the results as pandas DataFrames of up to chunksize rows, so the full result set is never held in memory.
+# Yields nothing if the connection or the query fails.
+def fetch_data(query, chunksize=5000):
     conn = connect_access()
     if conn is None:
-        return pd.DataFrame()
+        return
     try:
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        yield from pd.read_sql_query(query, conn, chunksize=chunksize)
         logging.info("Data fetched successfully.")
-        return df
     except Exception as e:
         logging.error("Failed to fetch data: %s", e)
-        return pd.DataFrame()
 
 # Sends data to DocuWare without attaching a document file.
 # The entry is created in the specified file cabinet using the active session.
+# The payload is serialized with orjson and sent as raw bytes.
 def send_to_docuware(fields, session):
-    payload = {"Fields": fields}
-    response = session.post(
-        f"{DW_URL}/FileCabinets/{DW_GUID}/Documents",
-        json=payload,
-        headers={"Accept": "application/json", "Content-Type": "application/json"}
-    )
+    body = orjson.dumps({"Fields": fields}, option=orjson.OPT_SERIALIZE_NUMPY)
+    response = session.post(CFG.docs_url, data=body, headers=JSON_HEADERS)
     return response
 
+# Builds a tracking ID that stays the same across runs, unlike the per-process randomized hash().
+# It is derived from the duplicate key, so two entries share an ID only if they are duplicates.
+def tracking_id(field1, field2):
+    key1, key2 = tracking_key(field1, field2)
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(key1.encode())
+    digest.update(b"\x00")
+    digest.update(key2.encode())
+    return "ID_" + digest.hexdigest()
+
 # --- IMPORT FUNCTION ---
 # Imports records from a DataFrame into DocuWare based on the given field mapping and item type.
 # Duplicate entries are skipped using the SQLite manager.
 # Successfully imported records are logged and stored in the local tracking database.
+# Missing values are replaced by empty strings for the whole DataFrame at once.
+# Rows are read as plain tuples, so all column lookups are resolved to positions once up front.
+# Mapping sources that are not a column are sent as constant values.
+# New entries are uploaded in batches of UPLOAD_BATCH_SIZE, with up to UPLOAD_WORKERS requests in flight.
 def import_records(df, field_mapping, session, sqlite_manager):
+    df = df.astype(object).where(df.notna(), "")
+    positions = {column: pos for pos, column in enumerate(df.columns)}
+    field_positions = [(field_name, positions.get(source), source) for field_name, source in field_mapping.items()]
+    field1_pos = positions.get("field1")
+    field2_pos = positions.get("field2")
+
     def build_fields(row):
-        fields = []
-        for field_name, source in field_mapping.items():
-            value = row.get(source, source)
-            if pd.isna(value) or (isinstance(value, float) and math.isnan(value)):
-                value = ""
-            fields.append({"FieldName": field_name, "Item": value})
-        return fields
-
-    for _, row in df.iterrows():
-        field1 = row.get("field1", "")
-        field2 = row.get("field2", "")
-
-        if sqlite_manager.is_duplicate(field1, field2):
-            logging.info("Eintrag bereits importiert – übersprungen.")
-            continue
+        return [
+            {"FieldName": field_name, "Item": source if pos is None else row[pos]}
+            for field_name, pos, source in field_positions
+        ]
+
+    # Sends a single entry. Request errors are returned instead of raised, so one failed upload
+    # neither ends the run nor prevents the other uploads of the batch from being recorded.
+    def send(entry):
+        try:
+            return send_to_docuware(entry[2], session)
+        except requests.RequestException as e:
+            return e
 
-        fields = build_fields(row)
-        response = send_to_docuware(fields, session)
+    # Sends a batch of entries in parallel and stores each successful upload in the tracking database.
+    # The tracking entries are committed right after each batch, so an interrupted run loses at most one batch.
+    # Single entries are only logged at debug level; each batch is summarized in one info line.
+    def upload_batch(executor, batch):
+        imported = 0
+        responses = executor.map(send, batch)
+        for (field1, field2, _), response in zip(batch, responses):
+            if isinstance(response, requests.RequestException):
+                logging.error("Fehler beim Import: %s", response)
+            elif response.status_code == 200:
+                logging.debug("Eintrag erfolgreich importiert.")
+                sqlite_manager.insert(tracking_id(field1, field2), field1=field1, field2=field2)
+                imported += 1
+            else:
+                logging.error("Fehler beim Import: %s", response.status_code)
+                logging.error("Antwort: %s", response.text)
+        sqlite_manager.flush()
+        logging.info("%d von %d Einträgen erfolgreich importiert.", imported, len(batch))
 
-        if response.status_code == 200:
-            logging.info("Eintrag erfolgreich importiert.")
-            sqlite_manager.insert(f"ID_{hash(field1+field2)}", field1=field1, field2=field2)
-        else:
-            logging.error("Fehler beim Import: %s", response.status_code)
-            logging.error("Antwort: %s", response.text)
+    batch = []
+    queued = set()
+    skipped = 0
+    with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+        for row in df.itertuples(index=False, name=None):
+            field1 = "" if field1_pos is None else row[field1_pos]
+            field2 = "" if field2_pos is None else row[field2_pos]
+            key = tracking_key(field1, field2)
+
+            if key in queued or sqlite_manager.is_duplicate(field1, field2):
+                logging.debug("Eintrag bereits importiert – übersprungen.")
+                skipped += 1
+                continue
+
+            queued.add(key)
+            batch.append((field1, field2, build_fields(row)))
+            if len(batch) >= UPLOAD_BATCH_SIZE:
+                upload_batch(executor, batch)
+                batch = []
+                queued.clear()
+
+        if batch:
+            upload_batch(executor, batch)
+
+    if skipped:
+        logging.info("%d Einträge bereits importiert – übersprungen.", skipped)
+    sqlite_manager.flush()
 
 # Enables triggering multiple import functions, each of which can support a different set of hardcoded fields.
 def import_set1(session, sqlite_manager):
     query = """SELECT field1, field2 FROM source_table"""
-    df = fetch_data(query)
+    field_mapping = {"field1": "field1", "field2": "field2"}
 
-    if df.empty:
-        logging.warning("Aborted: No data found for import.")
-        return
+    found = False
+    for df in fetch_data(query):
+        if df.empty:
+            continue
+        found = True
+        import_records(df, field_mapping, session, sqlite_manager)
 
-    field_mapping = {"field1": "field1", "field2": "field2"}
-    import_records(df, field_mapping, session, sqlite_manager)
+    if not found:
+        logging.warning("Aborted: No data found for import.")
 
 # --- MAIN ENTRY POINT ---
 # Logs into DocuWare and imports data.
 # The local SQLite database, including duplicate checking, is integrated into the import function.
 def main():
     sqlite_manager = SQLiteManager()
-    sqlite_manager.setup()
+    try:
+        sqlite_manager.setup()
 
-    while True:
-        session = None
-        try:
-            session = docuware_login()
-            import_set1(session, sqlite_manager)
-            break
-        finally:
-            if session:
-                docuware_logout(session)
+        while True:
+            session = None
+            try:
+                session = docuware_login()
+                import_set1(session, sqlite_manager)
+                break
+            finally:
+                if session:
+                    docuware_logout(session)
+    finally:
+        sqlite_manager.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
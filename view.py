@@ -1,31 +1,29 @@
 import sqlite3
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-SQLITE_DATABASE = os.getenv("SQLITE_DATABASE")
-SQLITE_TABLE = os.getenv("SQLITE_TABLE")
+import sys
+from config import CFG
 
 # Connects to the local SQLite database and prints all records
 # from the specified table in a formatted output.
+# Records are read and written in chunks of 1000 rows, with one write per chunk.
 def print_sqlite_table():
     try:
-        conn = sqlite3.connect(SQLITE_DATABASE)
+        conn = sqlite3.connect(CFG.sqlite_database)
         cursor = conn.cursor()
+        cursor.arraysize = 1000
 
-        cursor.execute(f"SELECT * FROM {SQLITE_TABLE}")
-        rows = cursor.fetchall()
+        cursor.execute(f"SELECT * FROM {CFG.sqlite_table}")
+        rows = cursor.fetchmany()
 
         if not rows:
             print("No records found.")
         else:
-            print(f"Records in '{SQLITE_TABLE}':\n")
+            print(f"Records in '{CFG.sqlite_table}':\n")
             columns = [desc[0] for desc in cursor.description]
-            print(" | ".join(columns))
-            print("-" * 80)
-            for row in rows:
-                print(" | ".join(str(cell) if cell is not None else "" for cell in row))
+            out = sys.stdout.write
+            out(" | ".join(columns) + "\n" + "-" * 80 + "\n")
+            while rows:
+                out("".join(" | ".join(str(cell) if cell is not None else "" for cell in row) + "\n" for row in rows))
+                rows = cursor.fetchmany()
 
         conn.close()
     except Exception as e: